@@ -1,76 +1,68 @@
 # --- Imports ---
 # Import the necessary libraries
-import os
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from google.cloud import bigquery
+import scipy.stats as stats
+
+from utils.load_aou import load_aou
 
 # --- Setup ---
 # Set the style for all our plots
 sns.set(style="whitegrid")
 
-# Get the CDR (Curated Data Repository) version for your workspace
-# This environment variable is set automatically in your AoU notebook
-cdr_dataset_id = os.environ.get('WORKSPACE_CDR')
-
-if cdr_dataset_id:
-    print(f"Querying CDR: {cdr_dataset_id}")
-else:
-    print("Error: WORKSPACE_CDR environment variable not set.")
-    # You can manually set this if needed, e.g.:
-    # cdr_dataset_id = 'my-project.my_cdr_dataset'
-
-# Initialize the BigQuery client
-client = bigquery.Client()
-
-# --- 1. The SQL Query (Demographics) ---
-# This query joins the PERSON table with the CONCEPT table to get
-# human-readable names for the concept IDs.
-# We are only querying Registered Tier fields (Age, Sex, Race, Ethnicity)
-# to get this script working for your deadline.
-
-# We use 2025 as the current year to calculate age.
-sql_query = f"""
-SELECT
-    (2025 - p.year_of_birth) AS age,
-    c_sex.concept_name AS sex_at_birth,
-    c_race.concept_name AS race,
-    c_eth.concept_name AS ethnicity
-FROM
-    `{cdr_dataset_id}.person` p
-LEFT JOIN
-    `{cdr_dataset_id}.concept` c_sex ON p.sex_at_birth_concept_id = c_sex.concept_id
-LEFT JOIN
-    `{cdr_dataset_id}.concept` c_race ON p.race_concept_id = c_race.concept_id
-LEFT JOIN
-    `{cdr_dataset_id}.concept` c_eth ON p.ethnicity_concept_id = c_eth.concept_id
-"""
-
-# --- 2. Run Query and Load Data (Demographics) ---
-# This runs the query and loads the results directly into a pandas DataFrame.
+# --- Helper: fast histogram with a subsampled KDE curve ---
+# sns.histplot(..., kde=True) evaluates a Gaussian KDE over the *full*
+# sample (O(N) work per grid point) and emits one vector artist per bar,
+# which makes inline notebook rendering crawl at cohort scale. Instead we
+# bin the data once with np.histogram and estimate the smoothing curve on
+# a 10k random subsample over a 200-point grid - visually identical, but
+# the render cost no longer grows with cohort size.
+
+def fast_histplot(values, bins=30):
+    """Plot a count histogram plus KDE curve on the current axes."""
+    values = values[~np.isnan(values)]
+    counts, edges = np.histogram(values, bins=bins)
+    ax = plt.gca()
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+           alpha=0.75, edgecolor='white')
+    if len(values) > 1:
+        rng = np.random.default_rng()
+        sample = (values if len(values) <= 10_000
+                  else rng.choice(values, 10_000, replace=False))
+        grid = np.linspace(edges[0], edges[-1], 200)
+        density = stats.gaussian_kde(sample)(grid)
+        # Scale the density curve up to the count axis
+        ax.plot(grid, density * len(values) * (edges[1] - edges[0]), color='C0')
+    return ax
+
+# --- 1. Load Data (Demographics) ---
+# level1 and level2 share ONE combined BigQuery query whose result
+# utils/load_aou.py caches locally as Parquet. Here we only read the four
+# demographic columns off disk; the label columns come back as
+# categoricals, so no full string columns are materialized.
 try:
-    print("Running query to fetch demographic data...")
-    df_demographics = client.query(sql_query).to_dataframe()
+    print("Loading demographic data...")
+    df_demographics = load_aou(columns=['age', 'sex_at_birth', 'race', 'ethnicity'])
     print(f"Successfully loaded {len(df_demographics)} demographic records.")
-    
-    # Display the first few rows to check
-    print("\nData Head (Demographics):")
-    print(df_demographics.head())
-
 except Exception as e:
     print(f"An error occurred: {e}")
-    # If the query fails, we'll create an empty DataFrame to avoid further errors
     df_demographics = pd.DataFrame()
 
-# --- 3. Plot the Distributions (Demographics) ---
+# 'age' arrives as nullable Int16; nulls (missing year_of_birth) become
+# NaN in the float conversion.
+ages = (df_demographics['age'].to_numpy(dtype=np.float64, na_value=np.nan)
+        if len(df_demographics) else np.array([]))
+
+# --- 2. Plot the Distributions (Demographics) ---
 # We will create a series of plots to visualize the data ratios.
 
 # --- Plot 1: Age Distribution ---
 # A histogram is best for a continuous variable like age.
 plt.figure(figsize=(10, 6))
-# .dropna() handles any participants with a missing year_of_birth
-sns.histplot(data=df_demographics.dropna(subset=['age']), x='age', bins=30, kde=True)
+# NaN ages (missing year_of_birth) are dropped inside the helper
+fast_histplot(ages, bins=30)
 plt.title('Distribution of Participant Age', fontsize=16)
 plt.xlabel('Age', fontsize=12)
 plt.ylabel('Count', fontsize=12)
@@ -78,8 +70,10 @@ plt.show()
 
 # --- Plot 2: Sex at Birth ---
 # A horizontal count plot is best for long categorical labels.
+# value_counts on a categorical column is a cheap bincount of the codes.
 plt.figure(figsize=(10, 6)) # Adjusted figsize for a good horizontal layout
-sns.countplot(data=df_demographics, y='sex_at_birth', order=df_demographics['sex_at_birth'].value_counts().index)
+vc_sex = df_demographics['sex_at_birth'].value_counts()
+sns.barplot(x=vc_sex.values, y=vc_sex.index.astype(str), orient='h')
 plt.title('Distribution of Sex at Birth', fontsize=16)
 plt.xlabel('Count', fontsize=12) # Swapped to be the x-axis label
 plt.ylabel('Sex at Birth', fontsize=12) # Swapped to be the y-axis label
@@ -90,7 +84,8 @@ plt.show()
 # We use a horizontal plot (y='race') because the labels can be long
 # and would overlap if plotted vertically.
 plt.figure(figsize=(12, 8))
-sns.countplot(data=df_demographics, y='race', order=df_demographics['race'].value_counts().index)
+vc_race = df_demographics['race'].value_counts()
+sns.barplot(x=vc_race.values, y=vc_race.index.astype(str), orient='h')
 plt.title('Distribution of Self-Reported Race', fontsize=16)
 plt.xlabel('Count', fontsize=12)
 plt.ylabel('Race', fontsize=12)
@@ -98,55 +93,37 @@ plt.show()
 
 # --- Plot 4: Ethnicity ---
 plt.figure(figsize=(10, 6))
-sns.countplot(data=df_demographics, y='ethnicity', order=df_demographics['ethnicity'].value_counts().index)
+vc_eth = df_demographics['ethnicity'].value_counts()
+sns.barplot(x=vc_eth.values, y=vc_eth.index.astype(str), orient='h')
 plt.title('Distribution of Self-Reported Ethnicity', fontsize=16)
 plt.xlabel('Count', fontsize=12)
 plt.ylabel('Ethnicity', fontsize=12)
 plt.show()
 
 
-# --- 4. NEW: Socioeconomic (SES) Analysis ---
+# --- 3. NEW: Socioeconomic (SES) Analysis ---
 # Based on the Data Dictionary, we can link participant 3-digit ZIP codes
-# (from the observation table) to the zip3_ses_map table.
+# (from the observation table) to the zip3_ses_map table. That join is
+# already part of the combined cached query, so here we just read the
+# three SES columns off disk; participants without a ZIP observation have
+# NaNs, which the histograms drop.
 
 print("\n--- Starting Socioeconomic (SES) Analysis ---")
 
-# This concept ID (1585250) corresponds to the "StreetAddress_PIIZIP"
-# question from "The Basics" survey, which stores the 3-digit ZIP.
-sql_query_ses = f"""
-SELECT
-    ses.median_income,
-    ses.fraction_poverty,
-    ses.fraction_no_health_ins
-FROM
-    `{cdr_dataset_id}.observation` AS obs
-JOIN
-    `{cdr_dataset_id}.zip3_ses_map` AS ses
-ON
-    obs.value_as_string = ses.zip3_as_string
-WHERE
-    obs.observation_source_concept_id = 1585250
-"""
-
-# --- 5. Run Query and Load Data (SES) ---
 try:
-    print("Running query to fetch SES data...")
-    df_ses = client.query(sql_query_ses).to_dataframe()
+    print("Loading SES data...")
+    df_ses = load_aou(columns=['median_income', 'fraction_poverty',
+                               'fraction_no_health_ins'])
     print(f"Successfully loaded {len(df_ses)} SES records.")
-    
-    # Display the first few rows to check
-    print("\nData Head (SES):")
-    print(df_ses.head())
-
 except Exception as e:
-    print(f"An error occurred during SES query: {e}")
+    print(f"An error occurred during SES load: {e}")
     df_ses = pd.DataFrame()
 
-# --- 6. Plot the SES Distributions ---
+# --- 4. Plot the SES Distributions ---
 
 # --- Plot 5: Median Income Distribution ---
 plt.figure(figsize=(10, 6))
-sns.histplot(data=df_ses.dropna(subset=['median_income']), x='median_income', bins=30, kde=True)
+fast_histplot(df_ses['median_income'].to_numpy(dtype=np.float64), bins=30)
 plt.title('Distribution of Median Income (by 3-digit ZIP)', fontsize=16)
 plt.xlabel('Median Income', fontsize=12)
 plt.ylabel('Count of Participants', fontsize=12)
@@ -154,7 +131,7 @@ plt.show()
 
 # --- Plot 6: Poverty Fraction Distribution ---
 plt.figure(figsize=(10, 6))
-sns.histplot(data=df_ses.dropna(subset=['fraction_poverty']), x='fraction_poverty', bins=30, kde=True)
+fast_histplot(df_ses['fraction_poverty'].to_numpy(dtype=np.float64), bins=30)
 plt.title('Distribution of Poverty Percent (by 3-digit ZIP)', fontsize=16)
 plt.xlabel('Percent of Population Below Poverty Level (%)', fontsize=12) # <-- CHANGED
 plt.ylabel('Count of Participants', fontsize=12)
@@ -163,7 +140,7 @@ plt.show()
 
 # --- Plot 7: No Health Insurance Percent Distribution ---
 plt.figure(figsize=(10, 6))
-sns.histplot(data=df_ses.dropna(subset=['fraction_no_health_ins']), x='fraction_no_health_ins', bins=30, kde=True)
+fast_histplot(df_ses['fraction_no_health_ins'].to_numpy(dtype=np.float64), bins=30)
 plt.title('Distribution of No Health Insurance Percent (by 3-digit ZIP)', fontsize=16)
 plt.xlabel('Percent of Population with No Health Insurance (%)', fontsize=12) # <-- CHANGED
 plt.ylabel('Count of Participants', fontsize=12)
@@ -1,12 +1,16 @@
 # --- Imports ---
 # Import the necessary libraries
 import os
+import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from google.cloud import bigquery
+from google.cloud import bigquery_storage
 import scipy.stats as stats
-import scikit_posthocs as sp
+from numba import njit
+
+from utils.load_aou import load_aou
 
 # --- Setup ---
 # Set the style for all our plots
@@ -24,45 +28,190 @@ else:
 # Initialize the BigQuery client
 client = bigquery.Client()
 
-# --- 1. THE COMBINED SQL QUERY (LEVEL 2 ANALYSIS) ---
-# This single query gets BOTH demographics and SES data in one table.
-# We use LEFT JOINs so we can also analyze "missingness."
-# We link person -> observation (for 3-digit zip) -> zip3_ses_map (for SES data)
-
-sql_query = f"""
-SELECT
-    p.person_id,
-    (2025 - p.year_of_birth) AS age,
-    c_sex.concept_name AS sex_at_birth,
-    c_race.concept_name AS race,
-    c_eth.concept_name AS ethnicity,
-    ses.median_income,
-    ses.fraction_poverty,
-    ses.fraction_no_health_ins
-FROM
-    `{cdr_dataset_id}.person` p
-LEFT JOIN
-    `{cdr_dataset_id}.concept` c_sex ON p.sex_at_birth_concept_id = c_sex.concept_id
-LEFT JOIN
-    `{cdr_dataset_id}.concept` c_race ON p.race_concept_id = c_race.concept_id
-LEFT JOIN
-    `{cdr_dataset_id}.concept` c_eth ON p.ethnicity_concept_id = c_eth.concept_id
-LEFT JOIN
-    `{cdr_dataset_id}.observation` AS obs
-ON
-    p.person_id = obs.person_id AND obs.observation_source_concept_id = 1585250 -- 1585250 is the concept ID for 3-digit ZIP
-LEFT JOIN
-    `{cdr_dataset_id}.zip3_ses_map` AS ses
-ON
-    obs.value_as_string = ses.zip3_as_string
-"""
-
-# --- 2. Run Query and Load Data ---
+# Initialize the BigQuery Storage API client.
+# This downloads query results as parallel Arrow streams instead of paging
+# JSON rows over the REST API, which is ~10x faster for large tables.
+bqstorage_client = bigquery_storage.BigQueryReadClient()
+
+# Shared query parameters. Binding the concept ID as a BigQuery query
+# parameter (instead of f-string interpolation) keeps the query text
+# byte-identical between runs, so an identical rerun hits BigQuery's
+# 24-hour result cache (0 bytes scanned) instead of re-scanning the
+# person/observation tables.
+query_config = bigquery.QueryJobConfig(
+    query_parameters=[
+        bigquery.ScalarQueryParameter('zip3_concept_id', 'INT64', 1585250),
+    ],
+    use_query_cache=True,
+)
+
+# --- Helper: JIT-compiled Kruskal-Wallis H-test ---
+# scipy.stats.kruskal re-ranks the pooled sample with a Python-level tie
+# loop and materializes the rank array several times; at AoU scale that is
+# the dominant CPU cost after the download. This Numba kernel fuses the
+# argsort, the tie-corrected average ranks, and the per-group rank sums
+# into one compiled pass over the data.
+
+@njit(cache=True, fastmath=True)
+def kruskal_h(values, group_codes, n_groups):
+    """Tie-corrected Kruskal-Wallis H statistic over integer group codes."""
+    n = values.shape[0]
+    order = np.argsort(values, kind='mergesort')
+    ranks = np.empty(n, dtype=np.float64)
+    tie_sum = 0.0  # sum of (t^3 - t) over tie runs, for the correction
+    i = 0
+    while i < n:
+        j = i
+        while j + 1 < n and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        avg_rank = 0.5 * (i + j) + 1.0
+        for k in range(i, j + 1):
+            ranks[order[k]] = avg_rank
+        t = j - i + 1
+        if t > 1:
+            tie_sum += float(t) ** 3 - float(t)
+        i = j + 1
+    rank_sums = np.zeros(n_groups, dtype=np.float64)
+    counts = np.zeros(n_groups, dtype=np.float64)
+    for k in range(n):
+        rank_sums[group_codes[k]] += ranks[k]
+        counts[group_codes[k]] += 1.0
+    h = 0.0
+    for g in range(n_groups):
+        h += rank_sums[g] * rank_sums[g] / counts[g]
+    h = 12.0 / (n * (n + 1.0)) * h - 3.0 * (n + 1.0)
+    return h / (1.0 - tie_sum / (float(n) ** 3 - n))
+
+
+def kruskal_from_codes(values, group_codes):
+    """Run the jitted Kruskal-Wallis test; returns (H, p-value)."""
+    n_groups = int(group_codes.max()) + 1
+    hvalue = kruskal_h(values, group_codes, n_groups)
+    pvalue = stats.chi2.sf(hvalue, n_groups - 1)
+    return hvalue, pvalue
+
+
+def posthoc_dunn_bonferroni(values, group_codes, group_names):
+    """Dunn's post-hoc test with Bonferroni correction, fully vectorized.
+
+    Gives the same p-value table as scikit_posthocs.posthoc_dunn with
+    p_adjust='bonferroni', but ranks the pooled sample once and derives
+    every pairwise z-score with NumPy outer operations instead of
+    re-slicing the DataFrame for each pair of groups.
+    """
+    n_total = values.shape[0]
+    ranks = stats.rankdata(values)
+    counts = np.bincount(group_codes)
+    mean_ranks = np.bincount(group_codes, weights=ranks) / counts
+    # Tie correction term, shared by every pair
+    _, tie_counts = np.unique(values, return_counts=True)
+    tie_term = (tie_counts ** 3 - tie_counts).sum() / (12.0 * (n_total - 1))
+    variance = n_total * (n_total + 1) / 12.0 - tie_term
+    z = np.abs(np.subtract.outer(mean_ranks, mean_ranks)) / np.sqrt(
+        variance * np.add.outer(1.0 / counts, 1.0 / counts))
+    n_pairs = len(counts) * (len(counts) - 1) // 2
+    pvals = np.minimum(2.0 * stats.norm.sf(z) * n_pairs, 1.0)
+    np.fill_diagonal(pvals, 1.0)
+    return pd.DataFrame(pvals, index=group_names, columns=group_names)
+
+
+def boxplot_stats_by_group(df, group_col, value_col):
+    """Five-number summaries per group, in the format Axes.bxp expects.
+
+    Whiskers follow the standard boxplot convention: the most extreme data
+    points within 1.5*IQR of the quartiles. Everything is computed with
+    vectorized groupby reductions, so the raw points never reach matplotlib.
+    """
+    # observed=True keeps categories that the caller's filtering emptied out
+    # from generating useless all-NaN groups.
+    grouped = df.groupby(group_col, observed=True)[value_col]
+    q = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    iqr = q[0.75] - q[0.25]
+    lo_fence = df[group_col].map(q[0.25] - 1.5 * iqr).astype(float)
+    hi_fence = df[group_col].map(q[0.75] + 1.5 * iqr).astype(float)
+    values = df[value_col]
+    whislo = values.where(values >= lo_fence).groupby(df[group_col], observed=True).min()
+    whishi = values.where(values <= hi_fence).groupby(df[group_col], observed=True).max()
+    return [
+        {'label': group, 'med': q.at[group, 0.5],
+         'q1': q.at[group, 0.25], 'q3': q.at[group, 0.75],
+         'whislo': whislo[group], 'whishi': whishi[group], 'fliers': []}
+        for group in q.index if not np.isnan(q.at[group, 0.5])
+    ]
+
+
+def add_stat_text(pvalue, test_name, word='Deviation', corner='top'):
+    """Annotate the current axes with the colored significance box."""
+    if pvalue < 0.05:
+        box_color = 'lightgreen'
+        # Format the p-value string to handle very small numbers
+        p_text = "p < 0.001" if pvalue < 0.001 else f"p = {pvalue:.3f}"
+        stat_text = f"Statistically Significant {word}\n({test_name} {p_text})"
+    else:
+        box_color = 'lightgray'
+        stat_text = f"No Significant {word} Found\n({test_name} p = {pvalue:.3f})"
+    # Pin the box to the top- or bottom-right corner, away from the data
+    y, valign = (0.98, 'top') if corner == 'top' else (0.02, 'bottom')
+    plt.text(0.98, y, stat_text,
+             transform=plt.gca().transAxes,
+             fontsize=12, verticalalignment=valign, horizontalalignment='right',
+             bbox=dict(boxstyle='round,pad=0.5', facecolor=box_color, alpha=0.5))
+
+
+def grouped_boxplot_with_kw(df, group_col, value_col, title, xlabel, ylabel,
+                            exclude=None, ylim=None, figsize=(10, 6)):
+    """Boxplot of value_col by group_col, plus a Kruskal-Wallis H-test.
+
+    One function for the repeated mask -> codes -> test -> plot -> annotate
+    pipeline: the NaN/exclusion mask is built once, the categorical codes
+    are extracted once and shared by the test and the plot summaries, the
+    boxes are drawn from five-number summaries via Axes.bxp, and the test
+    result is stamped on the plot.
+
+    Returns (values, codes, categories, hvalue, pvalue) so callers can feed
+    the exact same arrays into post-hoc tests without re-slicing.
+    """
+    mask = df[group_col].notna() & df[value_col].notna()
+    if exclude is not None and exclude in df[group_col].cat.categories:
+        # Compare int8 category codes rather than hashing a string per row
+        excl_code = df[group_col].cat.categories.get_loc(exclude)
+        mask &= df[group_col].cat.codes.to_numpy() != excl_code
+    test_data = df.loc[mask, [group_col, value_col]]
+
+    groups = test_data[group_col].cat.remove_unused_categories()
+    codes = groups.cat.codes.to_numpy()
+    values = test_data[value_col].to_numpy(dtype=np.float64)
+
+    plt.figure(figsize=figsize)
+    plt.gca().bxp(boxplot_stats_by_group(test_data, group_col, value_col),
+                  showfliers=False)
+    if ylim is not None:
+        # "Zoom in" on the boxes, cutting off the most extreme whiskers
+        plt.ylim(*ylim)
+    plt.title(title, fontsize=16)
+    plt.xlabel(xlabel, fontsize=12)
+    plt.ylabel(ylabel, fontsize=12)
+    plt.xticks(rotation=45, ha='right')
+
+    # Kruskal-Wallis compares MEDIANS, not means, and is robust to outliers
+    hvalue, pvalue = kruskal_from_codes(values, codes)
+    add_stat_text(pvalue, 'Kruskal-Wallis')
+    plt.show()
+    return values, codes, groups.cat.categories, hvalue, pvalue
+
+
+# --- 1. Load the Combined Analysis Data ---
+# The combined person/observation/zip3_ses_map query now lives in
+# utils/load_aou.py, which caches its result locally as Parquet and is
+# shared with level1. We only read the four columns the analyses below
+# use; the label columns come back as categoricals straight from the
+# dictionary-encoded Parquet pages.
 try:
-    print("Running combined query to fetch all analysis data...")
-    df_analysis = client.query(sql_query).to_dataframe()
+    print("Loading combined analysis data...")
+    df_analysis = load_aou(columns=['race', 'ethnicity', 'median_income',
+                                    'fraction_poverty'])
     print(f"Successfully loaded {len(df_analysis)} records.")
-    
+
     # Display the first few rows to check
     print("\nData Head (Combined Analysis):")
     print(df_analysis.head())
@@ -72,155 +221,56 @@ except Exception as e:
     df_analysis = pd.DataFrame()
 
 
-# --- 3. LEVEL 2 ANALYSIS (The *Meaningful* Analysis for Your Paper) ---
+# --- 2. LEVEL 2 ANALYSIS (The *Meaningful* Analysis for Your Paper) ---
 
 # --- Analysis Plot 1: Income vs. Race ---
-# This boxplot shows if income is differently distributed across racial groups.
-
-plt.figure(figsize=(14, 8))
-
-# 1. Create a filtered DataFrame that REMOVES the 'No matching concept' group
-plot_data = df_analysis[df_analysis['race'] != 'No matching concept']
-
-# 2. Use this 'plot_data' for the boxplot. We will plot all outliers.
-sns.boxplot(data=plot_data, x='race', y='median_income')
-
-# --- BEGIN PLOT FIX ---
-# 3. Set the Y-axis limit to 0-180,000 as requested
-#    This will "zoom in" on the boxes and cut off the most extreme outliers.
-plt.ylim(0, 180000)
-# --- END PLOT FIX ---
-
-plt.title('Median Income Distribution by Self-Reported Race', fontsize=16)
-plt.xlabel('Self-Reported Race', fontsize=12)
-plt.ylabel('Median Income (by 3-digit ZIP)', fontsize=12)
-plt.xticks(rotation=45, ha='right')
-
-# --- BEGIN STATISTICAL TEST ---
-# We use a Kruskal-Wallis H-test.
-# This test compares MEDIANS, not means, and is robust to outliers.
-
-# 1. Clean data for the test (remove NaNs AND 'No matching concept')
-test_data = df_analysis.dropna(subset=['race', 'median_income'])
-test_data = test_data[test_data['race'] != 'No matching concept'] 
-
-# 2. Get a list of all unique race groups
-groups = test_data['race'].unique()
-
-# 3. Create a list of the median_income data for each group
-income_by_group = [test_data['median_income'][test_data['race'] == group] for group in groups]
-
-# 4. Run the Kruskal-Wallis H-test
-hvalue, pvalue = stats.kruskal(*income_by_group)
-
-# 5. Create the text to display on the plot
-if pvalue < 0.05:
-    stat_text = "Statistically Significant Deviation\n"
-    box_color = 'lightgreen'
-    
-    # Format the p-value string to handle very small numbers
-    if pvalue < 0.001:
-        p_text = "p < 0.001"
-    else:
-        p_text = f"p = {pvalue:.3f}"
-    
-    stat_text += f"(Kruskal-Wallis {p_text})"
-    
-else:
-    box_color = 'lightgray'
-    stat_text = f"No Significant Deviation Found\n(Kruskal-Wallis p = {pvalue:.3f})"
-
-# --- BEGIN TEXT BOX FIX ---
-# 6. Add the text to the TOP-RIGHT corner to avoid data
-plt.text(0.98, 0.98, stat_text,
-         transform=plt.gca().transAxes,
-         fontsize=12, verticalalignment='top', horizontalalignment='right', # <-- Set horizontal to 'right'
-         bbox=dict(boxstyle='round,pad=0.5', facecolor=box_color, alpha=0.5))
-# --- END TEXT BOX FIX ---
-         
-# --- END STATISTICAL TEST ---
-
-plt.show()
-
-
-
+# This boxplot shows if income is differently distributed across racial
+# groups. The 'No matching concept' group is removed, and the y-limit
+# "zooms in" on the 0-180,000 range as requested.
+grouped_boxplot_with_kw(
+    df_analysis, 'race', 'median_income',
+    title='Median Income Distribution by Self-Reported Race',
+    xlabel='Self-Reported Race',
+    ylabel='Median Income (by 3-digit ZIP)',
+    exclude='No matching concept',
+    ylim=(0, 180000),
+    figsize=(14, 8),
+)
 
 
 # --- Data Cleaning for Plot 2 Label ---
 # We replace the long, messy label with a clean one *before* plotting.
+# On a categorical column this is a rename of one entry in the small
+# categories index (O(#groups)); .replace() would compare every row's
+# string and decay the column back to object dtype.
 long_label = 'What Race Ethnicity: Race Ethnicity None Of These'
 short_label = 'None Of These'
-df_analysis['ethnicity'] = df_analysis['ethnicity'].replace(long_label, short_label)
+if long_label in df_analysis['ethnicity'].cat.categories:
+    df_analysis['ethnicity'] = df_analysis['ethnicity'].cat.rename_categories(
+        {long_label: short_label})
 
 
 # --- Analysis Plot 2: Poverty vs. Ethnicity ---
 # This boxplot shows if poverty is differently distributed by ethnicity.
-plt.figure(figsize=(10, 6))
-
-# 1. Use the *full* DataFrame for plotting.
-sns.boxplot(data=df_analysis, x='ethnicity', y='fraction_poverty')
-
-# 2. Set the Y-axis limit to "zoom in" on the boxes.
-plt.ylim(0, 75) # Zoom in on the 0-75% range
-
-plt.title('Poverty Percent Distribution by Self-Reported Ethnicity', fontsize=16)
-plt.xlabel('Self-Reported Ethnicity', fontsize=12)
-plt.ylabel('Poverty Percent (by 3-digit ZIP)', fontsize=12)
-plt.xticks(rotation=45, ha='right')
-
-# --- BEGIN STATISTICAL TEST ---
-# We use a Kruskal-Wallis H-test (compares medians, robust to outliers).
-
-# 1. Clean data for the test (remove NaNs ONLY)
-test_data_eth = df_analysis.dropna(subset=['ethnicity', 'fraction_poverty'])
-
-# 2. Get a list of all unique ethnicity groups
-groups_eth = test_data_eth['ethnicity'].unique()
-
-# 3. Create a list of the poverty data for each group
-poverty_by_group = [test_data_eth['fraction_poverty'][test_data_eth['ethnicity'] == group] for group in groups_eth]
-
-# 4. Run the Kruskal-Wallis H-test
-hvalue, pvalue = stats.kruskal(*poverty_by_group)
-
-# 5. Create the text to display on the plot
-if pvalue < 0.05:
-    stat_text = "Statistically Significant Deviation\n"
-    box_color = 'lightgreen'
-    
-    # Format the p-value string to handle very small numbers
-    if pvalue < 0.001:
-        p_text = "p < 0.001"
-    else:
-        p_text = f"p = {pvalue:.3f}"
-    
-    stat_text += f"(Kruskal-Wallis {p_text})"
-    
-else:
-    box_color = 'lightgray'
-    stat_text = f"No Significant Deviation Found\n(Kruskal-Wallis p = {pvalue:.3f})"
-
-# 6. Add the text to the TOP-RIGHT corner to avoid data
-plt.text(0.98, 0.98, stat_text,
-         transform=plt.gca().transAxes,
-         fontsize=12, verticalalignment='top', horizontalalignment='right',
-         bbox=dict(boxstyle='round,pad=0.5', facecolor=box_color, alpha=0.5))
-         
-# --- END STATISTICAL TEST ---
-
-plt.show()
+# We keep the values/codes arrays for the post-hoc test below.
+poverty_values, eth_codes, eth_categories, hvalue, pvalue = grouped_boxplot_with_kw(
+    df_analysis, 'ethnicity', 'fraction_poverty',
+    title='Poverty Percent Distribution by Self-Reported Ethnicity',
+    xlabel='Self-Reported Ethnicity',
+    ylabel='Poverty Percent (by 3-digit ZIP)',
+    ylim=(0, 75),
+)
 
 # --- BEGIN POST-HOC TEST (Dunn's Test) ---
 # This test will tell us *which* groups are different from each other.
 
 print("\n--- Post-Hoc Test Results (Dunn's Test with Bonferroni Correction) ---")
 
-# Run Dunn's test on the same cleaned data
-# We specify the data, the value column, the group column, and the p-value correction method
-dunn_results = sp.posthoc_dunn(test_data_eth, 
-                               val_col='fraction_poverty', 
-                               group_col='ethnicity', 
-                               p_adjust='bonferroni')
+# Run Dunn's test on the same values/codes the Kruskal-Wallis test used.
+# The vectorized helper ranks the pooled data once, instead of re-slicing
+# the DataFrame for every pair of groups like scikit_posthocs does.
+dunn_results = posthoc_dunn_bonferroni(poverty_values, eth_codes,
+                                       eth_categories)
 
 print(dunn_results)
 
@@ -236,11 +286,57 @@ print("Any value in this table LESS THAN 0.05 is a *statistically significant* d
 # --- Analysis Plot 3: "Missingness" Analysis (Measurement Bias) ---
 # This plot checks if SES data is "missing" more often for one group than another.
 # We check for "null" values in the 'median_income' column (which we got from the LEFT JOIN).
+# Instead of downloading every participant row and counting nulls in pandas,
+# we let BigQuery do the counting: the aggregate query below returns one row
+# per race group (tens of rows instead of millions), which is all the barplot
+# and the chi-square test need.
 print("Calculating missing SES data by race...")
 
+# The inner query deduplicates to the most recent ZIP observation per
+# participant (as in utils/load_aou.py), so the missing/total counts are
+# genuinely per-person rather than per join row.
+sql_query_missing = f"""
+SELECT
+    race,
+    COUNTIF(median_income IS NULL) AS n_missing,
+    COUNT(*) AS n_total
+FROM (
+    SELECT
+        c_race.concept_name AS race,
+        ses.median_income
+    FROM
+        `{cdr_dataset_id}.person` p
+    LEFT JOIN
+        `{cdr_dataset_id}.concept` c_race ON p.race_concept_id = c_race.concept_id
+    LEFT JOIN
+        `{cdr_dataset_id}.observation` AS obs
+    ON
+        p.person_id = obs.person_id AND obs.observation_source_concept_id = @zip3_concept_id
+    LEFT JOIN
+        `{cdr_dataset_id}.zip3_ses_map` AS ses
+    ON
+        obs.value_as_string = ses.zip3_as_string
+    WHERE
+        TRUE
+    QUALIFY
+        ROW_NUMBER() OVER (
+            PARTITION BY p.person_id ORDER BY obs.observation_date DESC) = 1
+)
+GROUP BY
+    race
+"""
+
+try:
+    df_missing_by_race = client.query(sql_query_missing, job_config=query_config).to_dataframe(
+        bqstorage_client=bqstorage_client, create_bqstorage_client=False)
+    print(f"Successfully loaded missingness counts for {len(df_missing_by_race)} race groups.")
+except Exception as e:
+    print(f"An error occurred during missingness query: {e}")
+    df_missing_by_race = pd.DataFrame()
+
 # This part is for the PLOT
-missing_data = df_analysis.groupby('race')['median_income'].apply(lambda x: x.isnull().mean() * 100)
-missing_df = missing_data.reset_index(name='percent_missing_ses_data')
+missing_df = df_missing_by_race.copy()
+missing_df['percent_missing_ses_data'] = missing_df['n_missing'] / missing_df['n_total'] * 100
 missing_df = missing_df.sort_values(by='percent_missing_ses_data', ascending=False)
 
 plt.figure(figsize=(12, 8))
@@ -252,42 +348,20 @@ plt.ylabel('Self-Reported Race', fontsize=12)
 # --- BEGIN STATISTICAL TEST (CHI-SQUARE) ---
 # We test if the proportion of missing data is independent of race.
 
-# 1. Create a new column 'ses_data_missing' (True/False)
-#    This makes creating the contingency table easy.
-df_analysis['ses_data_missing'] = df_analysis['median_income'].isnull()
+# 1. Build the contingency table straight from the BigQuery counts.
+#    This table shows the *raw counts* of (Missing vs. Not-Missing) vs. (Race),
+#    so there is no need to re-scan the raw per-participant rows here.
+contingency_table = pd.DataFrame({
+    'missing': df_missing_by_race['n_missing'],
+    'not_missing': df_missing_by_race['n_total'] - df_missing_by_race['n_missing'],
+}).set_axis(df_missing_by_race['race'])
 
-# 2. Create the contingency table (cross-tabulation)
-#    This table shows the *raw counts* of (Missing vs. Not-Missing) vs. (Race).
-contingency_table = pd.crosstab(df_analysis['race'], df_analysis['ses_data_missing'])
-
-# 3. Run the Chi-Square test on the table
+# 2. Run the Chi-Square test on the table
 #    This returns the chi2 statistic, p-value, degrees of freedom, and expected frequencies
 chi2, pvalue, dof, expected = stats.chi2_contingency(contingency_table)
 
-# 4. Create the text to display on the plot
-if pvalue < 0.05:
-    stat_text = "Statistically Significant Difference\n"
-    box_color = 'lightgreen'
-    
-    # Format the p-value string to handle very small numbers
-    if pvalue < 0.001:
-        p_text = "p < 0.001"
-    else:
-        p_text = f"p = {pvalue:.3f}"
-    
-    stat_text += f"(Chi-Square {p_text})"
-    
-else:
-    box_color = 'lightgray'
-    stat_text = f"No Significant Difference Found\n(Chi-Square p = {pvalue:.3f})"
-    
-# --- BEGIN TEXT BOX FIX ---
-# 5. Add the text to the BOTTOM-RIGHT corner
-plt.text(0.98, 0.02, stat_text,
-         transform=plt.gca().transAxes,
-         fontsize=12, verticalalignment='bottom', horizontalalignment='right', # <-- CHANGED
-         bbox=dict(boxstyle='round,pad=0.5', facecolor=box_color, alpha=0.5))
-# --- END TEXT BOX FIX ---
+# 3. Add the significance box to the BOTTOM-RIGHT corner
+add_stat_text(pvalue, 'Chi-Square', word='Difference', corner='bottom')
 
 # --- END STATISTICAL TEST ---
 
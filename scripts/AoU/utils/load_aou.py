@@ -0,0 +1,165 @@
+# --- Shared AoU data loader with a local Parquet cache ---
+# level1 and level2 used to run three nearly identical BigQuery queries
+# between them, scanning the person/observation/zip3_ses_map tables each
+# time. This module runs ONE combined query, streams the result into a
+# local Parquet file, and serves every script from that cache: the first
+# run pays for a single scan, and every later run (or notebook restart)
+# reads straight off disk. Parquet is columnar, so each script only reads
+# the columns it asks for.
+
+import os
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from google.cloud import bigquery
+from google.cloud import bigquery_storage
+
+CACHE_PATH = 'cache/aou_combined.parquet'
+
+# The label columns are dictionary-encoded in the cache and come back as
+# pandas 'category' dtype, so no script pays for full string columns.
+LABEL_COLUMNS = ('sex_at_birth', 'race', 'ethnicity')
+
+# Narrowed numeric types. Every value comfortably fits (ages < 2^15, the
+# fractions are percentages, and incomes are far below float32 precision
+# loss territory), and halving the width halves both the cache file and
+# the memory bandwidth of every later scan over these columns.
+_NUMERIC_TYPES = {
+    'age': pa.int16(),
+    'median_income': pa.float32(),
+    'fraction_poverty': pa.float32(),
+    'fraction_no_health_ins': pa.float32(),
+}
+
+# age is nullable (missing year_of_birth), so it maps to pandas' nullable
+# Int16 instead of being silently upcast to float64 on conversion.
+_PANDAS_TYPES = {pa.int16(): pd.Int16Dtype()}
+
+# The combined query: person -> concept names, plus
+# person -> observation (3-digit ZIP) -> zip3_ses_map for the SES columns.
+# LEFT JOINs keep participants without SES data, which the missingness
+# analysis relies on; the level1 histograms simply drop the NaNs.
+# A participant can have several ZIP observations (e.g. a re-taken Basics
+# survey after an address change), which would fan the join out to one row
+# per observation and double-count them in every per-person statistic.
+# QUALIFY keeps only the most recent observation, so the table is exactly
+# one row per person. (The bare WHERE TRUE is required because BigQuery
+# only allows QUALIFY alongside a WHERE/GROUP BY/HAVING clause.)
+_SQL_TEMPLATE = """
+SELECT
+    (@current_year - p.year_of_birth) AS age,
+    c_sex.concept_name AS sex_at_birth,
+    c_race.concept_name AS race,
+    c_eth.concept_name AS ethnicity,
+    ses.median_income,
+    ses.fraction_poverty,
+    ses.fraction_no_health_ins
+FROM
+    `{cdr}.person` p
+LEFT JOIN
+    `{cdr}.concept` c_sex ON p.sex_at_birth_concept_id = c_sex.concept_id
+LEFT JOIN
+    `{cdr}.concept` c_race ON p.race_concept_id = c_race.concept_id
+LEFT JOIN
+    `{cdr}.concept` c_eth ON p.ethnicity_concept_id = c_eth.concept_id
+LEFT JOIN
+    `{cdr}.observation` AS obs
+ON
+    p.person_id = obs.person_id AND obs.observation_source_concept_id = @zip3_concept_id
+LEFT JOIN
+    `{cdr}.zip3_ses_map` AS ses
+ON
+    obs.value_as_string = ses.zip3_as_string
+WHERE
+    TRUE
+QUALIFY
+    ROW_NUMBER() OVER (
+        PARTITION BY p.person_id ORDER BY obs.observation_date DESC) = 1
+"""
+
+
+def _fetch_to_cache(cache_path):
+    """Run the combined query and stream it into the Parquet cache.
+
+    Record batches are written to the file as they arrive, so peak memory
+    is one batch plus the writer buffer - the full table is never held in
+    RAM here. The file is written to a temporary path and only renamed to
+    `cache_path` once the whole stream has been consumed: a mid-download
+    failure (network error, kernel interrupt) must never leave behind a
+    valid-looking but truncated cache that later runs would silently
+    analyze as if it were the full cohort.
+    """
+    cdr_dataset_id = os.environ.get('WORKSPACE_CDR')
+    if not cdr_dataset_id:
+        raise RuntimeError("WORKSPACE_CDR environment variable not set.")
+
+    client = bigquery.Client()
+    bqstorage_client = bigquery_storage.BigQueryReadClient()
+    query_config = bigquery.QueryJobConfig(
+        query_parameters=[
+            bigquery.ScalarQueryParameter('current_year', 'INT64',
+                                          datetime.now().year),
+            bigquery.ScalarQueryParameter('zip3_concept_id', 'INT64', 1585250),
+        ],
+        use_query_cache=True,
+    )
+
+    print(f"Querying CDR: {cdr_dataset_id}")
+    sql_query = _SQL_TEMPLATE.format(cdr=cdr_dataset_id)
+    rows = client.query(sql_query, job_config=query_config).result(
+        page_size=200_000)
+
+    cache_dir = os.path.dirname(cache_path)
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    tmp_path = cache_path + '.tmp'
+    writer = None
+    try:
+        for batch in rows.to_arrow_iterable(bqstorage_client=bqstorage_client):
+            table = pa.Table.from_batches([batch])
+            table = table.cast(_narrow_schema(table.schema))
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema,
+                                          compression='zstd')
+            writer.write_table(table, row_group_size=200_000)
+        if writer is None:
+            # No file was written, so load_aou would otherwise fail with a
+            # confusing FileNotFoundError on this and every later call.
+            raise RuntimeError(
+                "Combined AoU query returned no rows; check the CDR dataset.")
+        writer.close()
+        writer = None
+        os.replace(tmp_path, cache_path)
+    finally:
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _narrow_schema(schema):
+    """Swap BigQuery's int64/float64 defaults for the narrowed types."""
+    return pa.schema([pa.field(f.name, _NUMERIC_TYPES.get(f.name, f.type))
+                      for f in schema])
+
+
+def load_aou(columns=None, cache_path=CACHE_PATH):
+    """Return the combined AoU analysis table, reading only `columns`.
+
+    The first call runs the combined BigQuery query and fills the local
+    Parquet cache; every later call reads the requested columns straight
+    off disk. Delete the cache file to force a fresh query (e.g. after a
+    CDR version bump).
+    """
+    if not os.path.exists(cache_path):
+        print("No local cache found; running combined BigQuery query...")
+        _fetch_to_cache(cache_path)
+
+    read_dictionary = [col for col in LABEL_COLUMNS
+                       if columns is None or col in columns]
+    table = pq.read_table(cache_path, columns=columns,
+                          read_dictionary=read_dictionary)
+    return table.to_pandas(self_destruct=True, types_mapper=_PANDAS_TYPES.get)